@@ -0,0 +1,78 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of final responses keyed by a hash of the normalized prompt.
+
+    Entries older than the TTL are ignored on lookup and evicted by a write at most once
+    per eviction interval. The database file can be shared by several worker processes.
+    All methods block on SQLite, so async callers should run them in a thread.
+    """
+
+    def __init__(self, path: str, ttl: int, eviction_interval: int = 300):
+        """
+        Args:
+            path (str): Location of the SQLite database file
+            ttl (int): Seconds an entry stays valid
+            eviction_interval (int): Minimum seconds between sweeps for expired entries
+        """
+        self.ttl = ttl
+        self.eviction_interval = eviction_interval
+        self.last_eviction = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, ts INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_ts ON cache (ts)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(namespace: str, prompt: str) -> str:
+        """Hash the normalized prompt, scoped by namespace so endpoints don't share entries."""
+        normalized = prompt.strip().lower()
+        return hashlib.sha256(f"{namespace}\n{normalized}".encode()).hexdigest()
+
+    def get(self, namespace: str, prompt: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            namespace (str): The endpoint or tool the response belongs to
+            prompt (str): The user's prompt or query
+
+        Returns:
+            Optional[str]: The cached response, or None on a miss or expired entry
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND ts >= ?",
+                (self.make_key(namespace, prompt), int(time.time()) - self.ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, namespace: str, prompt: str, value: str) -> None:
+        """
+        Store a response, evicting expired entries if the eviction interval has passed.
+
+        Args:
+            namespace (str): The endpoint or tool the response belongs to
+            prompt (str): The user's prompt or query
+            value (str): The response to cache
+        """
+        now = int(time.time())
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, ts) VALUES (?, ?, ?)",
+                (self.make_key(namespace, prompt), value, now),
+            )
+            if now - self.last_eviction >= self.eviction_interval:
+                self.conn.execute("DELETE FROM cache WHERE ts < ?", (now - self.ttl,))
+                self.last_eviction = now
+            self.conn.commit()
@@ -1,31 +1,291 @@
+import asyncio
+import atexit
+import json
+import logging
+import logging.handlers
 import os
-from typing import Optional
+import queue
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Awaitable, Callable, Optional
+from urllib.parse import urlsplit, urlunsplit
+import httpx
+from botocore.config import Config as BotocoreConfig
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from strands import Agent, tool
+from strands import Agent, ToolContext, tool
 from strands.models import BedrockModel
-from tavily import TavilyClient
 from prompts.prompts import RESEARCH_FORMATTER_PROMPT, SIMPLE_SEARCH_PROMPT, SYSTEM_PROMPT
 from prompts.utils import (
     format_crawl_results_for_agent,
     format_extract_results_for_agent,
     format_search_results_for_agent,
 )
+from response_cache import ResponseCache
 import uvicorn
 
+load_dotenv()
+
+# Log records are handed to a queue and written by a listener thread so request
+# handlers never block on stdout
+logger = logging.getLogger("websearch")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logger.propagate = False
+log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 # Define constants
 RESEARCH_DIR = "research_findings"
-
-load_dotenv()
-if not os.getenv("TAVILY_API_KEY"):
+TAVILY_API_URL = "https://api.tavily.com"
+FORMATTER_MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+# Bedrock models that accept cachePoint blocks (cross-region prefix stripped).
+# Bedrock only caches a prefix of at least 1024 tokens on these models; the current
+# RESEARCH_FORMATTER_PROMPT is roughly 350 tokens, so its checkpoint is accepted but
+# nothing is cached until the prompt grows past that minimum.
+PROMPT_CACHE_MODEL_IDS = {
+    "anthropic.claude-3-5-sonnet-20241022-v2:0",
+    "anthropic.claude-3-5-haiku-20241022-v1:0",
+    "anthropic.claude-3-7-sonnet-20250219-v1:0",
+    "anthropic.claude-sonnet-4-20250514-v1:0",
+    "anthropic.claude-opus-4-20250514-v1:0",
+    "anthropic.claude-sonnet-4-5-20250929-v1:0",
+    "anthropic.claude-haiku-4-5-20251001-v1:0",
+    "anthropic.claude-opus-4-5-20251101-v1:0",
+}
+CROSS_REGION_PREFIXES = ("us.", "eu.", "apac.", "global.")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Matches the url field when a tool receives a JSON object instead of a plain URL
+URL_FIELD_RE = re.compile(r'"url"\s*:\s*"([^"]+)"')
+
+# Set DEBUG_STREAM=1 to interleave item structure details with the streamed response
+DEBUG_STREAM = os.getenv("DEBUG_STREAM") == "1"
+
+# Streamed text is coalesced until it reaches this size or age before being sent
+STREAM_FLUSH_BYTES = 256
+STREAM_FLUSH_SECONDS = 0.05
+
+# Resolved once at import; tools only use it through the shared Tavily client
+TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+if not TAVILY_API_KEY:
     raise ValueError(
         "TAVILY_API_KEY environment variable is not set. Please add it to your .env file."
     )
 
-tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-app = FastAPI(title="Web Search Agent")
+# Caps on in-flight requests per provider so fan-out can't push them into throttling.
+# BEDROCK_SEM is held per model call by BoundedBedrockModel, not per agent run, so a
+# tool that calls Bedrock from inside an agent run never waits on its own caller.
+TAVILY_SEM = asyncio.Semaphore(int(os.getenv("TAVILY_MAX_INFLIGHT", "8")))
+BEDROCK_SEM = asyncio.Semaphore(int(os.getenv("BEDROCK_MAX_INFLIGHT", "4")))
+
+# Per-attempt timeout for Tavily searches, retried after each delay in PROVIDER_RETRY_DELAYS
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "15"))
+PROVIDER_RETRY_DELAYS = (0.5, 1.5)
+# Extract and crawl run much longer. Their timeout is also sent to Tavily so it stops the
+# work server-side, and the client waits TAVILY_TIMEOUT_MARGIN longer for that reply.
+TAVILY_TIMEOUTS = {
+    "/search": PROVIDER_TIMEOUT,
+    "/extract": 60,
+    "/crawl": 150,
+}
+TAVILY_SERVER_TIMEOUT_ENDPOINTS = {"/extract", "/crawl"}
+TAVILY_TIMEOUT_MARGIN = 5
+# The formatter streams long responses, so it gets a larger overall budget and no retries
+FORMATTER_TIMEOUT = float(os.getenv("FORMATTER_TIMEOUT", "120"))
+
+# Bedrock calls from every agent give up on a stalled connection or stream after these
+# timeouts, and timed-out or throttled calls are retried by botocore
+BEDROCK_CLIENT_CONFIG = BotocoreConfig(
+    connect_timeout=10,
+    read_timeout=float(os.getenv("BEDROCK_READ_TIMEOUT", "60")),
+    retries={"max_attempts": 3, "mode": "standard"},
+)
+
+# Final responses for /simple-search and web_answer are reused for repeated prompts.
+# Lookups and writes are blocking sqlite3 calls, so they always run via asyncio.to_thread.
+response_cache = ResponseCache(
+    path=os.getenv("RESPONSE_CACHE_PATH", "/tmp/web-search-cache.sqlite3"),
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+)
+
+# Tavily responses are reused for identical requests, with a keep-alive TTL in seconds per endpoint
+TOOL_CACHE_SIZE = 512
+TOOL_CACHE_TTLS = {
+    "/search": 300,
+    "/extract": 900,
+    "/crawl": 900,
+}
+tool_caches = {
+    endpoint: TTLCache(maxsize=TOOL_CACHE_SIZE, ttl=ttl)
+    for endpoint, ttl in TOOL_CACHE_TTLS.items()
+}
+
+# Shared async HTTP client so Tavily calls reuse pooled connections and never block the event loop
+tavily_http = httpx.AsyncClient(
+    base_url=TAVILY_API_URL,
+    headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
+    timeout=httpx.Timeout(PROVIDER_TIMEOUT),
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await tavily_http.aclose()
+
+
+app = FastAPI(title="Web Search Agent", lifespan=lifespan)
+
+
+def base_model_id(model_id: str) -> str:
+    """Strip the cross-region inference prefix from a Bedrock model ID."""
+    for prefix in CROSS_REGION_PREFIXES:
+        if model_id.startswith(prefix):
+            return model_id[len(prefix):]
+    return model_id
+
+
+def supports_prompt_cache(model_id: str) -> bool:
+    """Check whether a Bedrock model ID accepts prompt cache checkpoints."""
+    return base_model_id(model_id) in PROMPT_CACHE_MODEL_IDS
+
+
+def cached_system_prompt(model_id: str, prompt: str):
+    """
+    Build a system prompt with a cache checkpoint after the static prompt text.
+
+    Args:
+        model_id (str): The Bedrock model the prompt will be sent to
+        prompt (str): The static system prompt
+
+    Returns:
+        The plain prompt if the model does not support caching, otherwise a list of
+        system content blocks ending with a cachePoint block
+    """
+    if not supports_prompt_cache(model_id):
+        return prompt
+
+    return [{"text": prompt}, {"cachePoint": {"type": "default"}}]
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonicalize a URL so equivalent spellings compare equal.
+
+    Lowercases the scheme and host, drops default ports and fragments, and strips
+    trailing slashes from the path.
+
+    Args:
+        url (str): An absolute http(s) URL
+
+    Returns:
+        str: The canonical URL, or the input unchanged if it cannot be parsed
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ""
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    userinfo, at, _ = parts.netloc.rpartition("@")
+    netloc = f"{userinfo}{at}{host}"
+
+    return urlunsplit((scheme, netloc, parts.path.rstrip("/"), parts.query, ""))
+
+
+def clean_url(url: str) -> str:
+    """
+    Normalize a URL passed in by the agent.
+
+    Args:
+        url (str): A URL, or a JSON object with a "url" field
+
+    Returns:
+        str: The canonical URL with an explicit http(s) scheme
+    """
+    stripped = url.strip()
+    if stripped.startswith("{"):
+        try:
+            parsed_url = json.loads(stripped).get("url")
+        except (json.JSONDecodeError, AttributeError):
+            m = URL_FIELD_RE.search(url)
+            parsed_url = m.group(1) if m else None
+        if isinstance(parsed_url, str):
+            url = parsed_url
+
+    if not url.lower().startswith(("http://", "https://")):
+        url = "https://" + url
+
+    return canonical_url(url)
+
+
+async def tavily_post(endpoint: str, payload: dict) -> dict:
+    """
+    Send a request to the Tavily REST API with the endpoint's timeout.
+    Searches and basic extracts are retried with backoff on timeouts; crawls and advanced
+    extracts are billed even when abandoned client-side, so they are not retried.
+    Successful responses are cached per endpoint, keyed by the canonical JSON body.
+
+    Args:
+        endpoint (str): The API path, e.g. "/search"
+        payload (dict): The JSON body, entries set to None are dropped
+
+    Returns:
+        dict: The decoded JSON response
+    """
+    body = {k: v for k, v in payload.items() if v is not None}
+    cache = tool_caches.get(endpoint)
+    cache_key = json.dumps(body, sort_keys=True)
+    if cache is not None:
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+    timeout = TAVILY_TIMEOUTS.get(endpoint, PROVIDER_TIMEOUT)
+    if endpoint in TAVILY_SERVER_TIMEOUT_ENDPOINTS:
+        body = {**body, "timeout": timeout}
+        timeout += TAVILY_TIMEOUT_MARGIN
+
+    retryable = endpoint == "/search" or (
+        endpoint == "/extract" and body.get("extract_depth") != "advanced"
+    )
+    retry_delays = PROVIDER_RETRY_DELAYS if retryable else ()
+
+    for delay in (*retry_delays, None):
+        try:
+            async with TAVILY_SEM:
+                response = await asyncio.wait_for(
+                    tavily_http.post(endpoint, json=body, timeout=timeout), timeout=timeout
+                )
+            break
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+    response.raise_for_status()
+    result = response.json()
+    if cache is not None:
+        cache[cache_key] = result
+    return result
+
 
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
@@ -37,7 +297,7 @@ app.add_middleware(
 )
 
 @tool
-def web_search(
+async def web_search(
     query: str,
     max_results: Optional[int] = 5,
     time_range: Optional[str] = None,
@@ -58,20 +318,25 @@ def web_search(
     Returns:
         str: The formatted web search results
     """
-    client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    if isinstance(include_domains, str):
+        include_domains = [domain.strip() for domain in include_domains.split(",")]
+
     formatted_results = format_search_results_for_agent(
-        client.get_search_context(
-            query=query,  
-            max_results=max_results,
-            time_range=time_range,
-            include_domains=include_domains,
+        await tavily_post(
+            "/search",
+            {
+                "query": query,
+                "max_results": max_results,
+                "time_range": time_range,
+                "include_domains": include_domains,
+            },
         )
     )
     return formatted_results
 
 
 @tool
-def web_answer(
+async def web_answer(
     query: str
 ) -> str:
     """Provides an answer to user's question using Web Search. Returns the answer as a String. The Result can be directly consumed as answer.
@@ -81,15 +346,38 @@ def web_answer(
     Returns:
         str: Response for the given query.
     """
-    client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-    formatted_results=client.qna_search(
-            query=query,  
+    cached_answer = await asyncio.to_thread(response_cache.get, "web_answer", query)
+    if cached_answer is not None:
+        return cached_answer
+
+    api_response = await tavily_post(
+        "/search",
+        {
+            "query": query,
+            "search_depth": "advanced",
+            "include_answer": True,
+        },
+    )
+    answer = api_response.get("answer", "")
+    if answer:
+        await asyncio.to_thread(response_cache.set, "web_answer", query, answer)
+    return answer
+
+
+async def extract_url(url: str, include_images: bool, extract_depth: str) -> dict:
+    """Extract a single URL with Tavily's extract API."""
+    return await tavily_post(
+        "/extract",
+        {
+            "urls": [url],  # List of URLs to extract content from
+            "include_images": include_images,  # Whether to include image extraction
+            "extract_depth": extract_depth,  # Depth of extraction (basic or advanced)
+        },
     )
-    return formatted_results
 
 
 @tool
-def web_extract(
+async def web_extract(
     urls: str | list[str], include_images: bool = False, extract_depth: str = "basic"
 ) -> str:
     """Extract content from one or more web pages using Tavily's extract API.
@@ -114,27 +402,27 @@ def web_extract(
             urls_list = urls
 
         # Clean and validate URLs
-        cleaned_urls = []
-        for url in urls_list:
-            if url.strip().startswith("{") and '"url":' in url:
-                import re
-
-                m = re.search(r'"url"\s*:\s*"([^"]+)"', url)
-                if m:
-                    url = m.group(1)
+        # Dedupe after canonicalization, keeping the first-seen order
+        cleaned_urls = list(dict.fromkeys(clean_url(url) for url in urls_list))
 
-            if not url.startswith(("http://", "https://")):
-                url = "https://" + url
-
-            cleaned_urls.append(url)
-
-        # Call Tavily extract API
-        api_response = tavily_client.extract(
-            urls=cleaned_urls,  # List of URLs to extract content from
-            include_images=include_images,  # Whether to include image extraction
-            extract_depth=extract_depth,  # Depth of extraction (basic or advanced)
+        # Call Tavily extract API once per URL so slow pages don't hold up the rest
+        responses = await asyncio.gather(
+            *[extract_url(url, include_images, extract_depth) for url in cleaned_urls],
+            return_exceptions=True,
         )
 
+        # Merge the per-URL responses into a single extract result
+        api_response = {"results": [], "failed_results": [], "response_time": 0}
+        for url, response in zip(cleaned_urls, responses):
+            if isinstance(response, Exception):
+                api_response["failed_results"].append({"url": url, "error": str(response)})
+                continue
+            api_response["results"].extend(response.get("results", []))
+            api_response["failed_results"].extend(response.get("failed_results", []))
+            api_response["response_time"] = max(
+                api_response["response_time"], response.get("response_time", 0)
+            )
+
         # Format the results for the agent
         formatted_results = format_extract_results_for_agent(api_response)
         return formatted_results
@@ -143,12 +431,13 @@ def web_extract(
         return f"Error during extraction: {e}\nURLs attempted: {urls}\nFailed to extract content."
 
 
-@tool
-def format_research_response(
+@tool(context=True)
+async def format_research_response(
     research_content: str,
+    tool_context: ToolContext,
     format_style: Optional[str] = None,
     user_query: Optional[str] = None,
-) -> str:
+) -> AsyncGenerator[dict | str, None]:
     """Format research content into a well-structured, properly cited response.
     The response will clearly address the user's query and present the research results in markdown format.
 
@@ -157,22 +446,21 @@ def format_research_response(
         format_style (Optional[str]): Desired format style (e.g., "blog", "report",
                                     "executive summary", "bullet points", "direct answer")
         user_query (Optional[str]): Original user question to help determine appropriate format
+        tool_context (ToolContext): Injected by Strands, not supplied by the model
 
-    Returns:
-        str: Professionally formatted research response with proper citations,
-             clear structure, and appropriate style for the intended audience
+    Yields:
+        dict: {"delta": str} fragments of the response as the model generates them
+        str: Finally, the professionally formatted research response with proper
+             citations, clear structure, and appropriate style for the intended audience
     """
-    # default_bedrock_model_id: str = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
-    print("using format_research_response")
+    logger.info("using format_research_response")
     try:
-        bedrock_model = BedrockModel(
-            model_id="us.anthropic.claude-3-5-sonnet-20241022-v2:0",
-            region_name="us-east-1",
-        )
-        # Strands Agents SDK makes it easy to create a specialized agent
+        # Agents keep conversation history, so each call gets its own agent on top of
+        # the shared model to avoid leaking one request's research into another
         formatter_agent = Agent(
-            model=bedrock_model,
-            system_prompt=RESEARCH_FORMATTER_PROMPT,
+            model=await get_bedrock_model("formatter"),
+            system_prompt=formatter_system_prompt,
+            callback_handler=None,
         )
 
         # Prepare the input for the formatter
@@ -186,15 +474,39 @@ def format_research_response(
 
         format_input += "Please format this research content according to the guidelines and appropriate style."
 
-        # Call the agent and return its response
-        response = formatter_agent(format_input)
-        return str(response)
+        # Stream the agent's tokens as they arrive; the last yield is the tool result.
+        # The deadline is applied to each step separately so no timeout scope is ever
+        # open across a yield, where it would cancel our consumer instead of this call.
+        fragments = []
+        response = None
+        deadline = asyncio.get_running_loop().time() + FORMATTER_TIMEOUT
+        events = formatter_agent.stream_async(format_input)
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        event = await anext(events)
+                except StopAsyncIteration:
+                    break
+                if "data" in event:
+                    fragments.append(event["data"])
+                    yield {"delta": event["data"]}
+                elif "result" in event:
+                    response = event["result"]
+        finally:
+            await events.aclose()
+        # The formatted report was already streamed to the client as it was generated, so
+        # end the calling agent's loop here instead of letting it write the report again
+        tool_context.invocation_state.setdefault("request_state", {})["stop_event_loop"] = True
+        yield str(response) if response is not None else "".join(fragments)
+    except TimeoutError:
+        yield f"Error in research formatting: timed out after {FORMATTER_TIMEOUT} seconds"
     except Exception as e:
-        return f"Error in research formatting: {str(e)}"
+        yield f"Error in research formatting: {str(e)}"
 
 
 @tool
-def web_crawl(url: str, instructions: Optional[str] = None) -> str:
+async def web_crawl(url: str, instructions: Optional[str] = None) -> str:
     """
     Crawls a given URL, processes the results, and formats them into a string.
     This tool conducts deep web crawls that find all nested links from a single page.
@@ -217,23 +529,18 @@ def web_crawl(url: str, instructions: Optional[str] = None) -> str:
     max_depth = 2
     limit = 20
 
-    if url.strip().startswith("{") and '"url":' in url:
-        import re
-
-        m = re.search(r'"url"\s*:\s*"([^"]+)"', url)
-        if m:
-            url = m.group(1)
-
-    if not url.startswith(("http://", "https://")):
-        url = "https://" + url
-
     try:
+        url = clean_url(url)
+
         # Crawls the web using Tavily API
-        api_response = tavily_client.crawl(
-            url=url,  # The URL to crawl
-            max_depth=max_depth,  # Defines how far from the base URL the crawler can explore
-            limit=limit,  # Limits the number of results returned
-            instructions=instructions,  # Optional instructions for the crawler
+        api_response = await tavily_post(
+            "/crawl",
+            {
+                "url": url,  # The URL to crawl
+                "max_depth": max_depth,  # Defines how far from the base URL the crawler can explore
+                "limit": limit,  # Limits the number of results returned
+                "instructions": instructions,  # Optional instructions for the crawler
+            },
         )
 
         tavily_results = (
@@ -248,120 +555,281 @@ def web_crawl(url: str, instructions: Optional[str] = None) -> str:
         return f"Error: {e}\n" f"URL attempted: {url}\n" "Failed to crawl the website."
 
 
-deep_research_web_agent = Agent(
-    system_prompt=SYSTEM_PROMPT,
-    tools=[
-        web_search,
-        web_crawl,
-        web_extract,
-        format_research_response,
-    ],
-)
+class BoundedBedrockModel(BedrockModel):
+    """BedrockModel that uses BEDROCK_CLIENT_CONFIG and holds BEDROCK_SEM for the duration of each model call."""
 
-simple_web_agent = Agent(
-    system_prompt=SIMPLE_SEARCH_PROMPT,
-    tools=[
-        web_search,
-        web_answer
-    ],
-)
+    def __init__(self, **kwargs):
+        kwargs.setdefault("boto_client_config", BEDROCK_CLIENT_CONFIG)
+        super().__init__(**kwargs)
+
+    async def stream(self, *args, **kwargs):
+        async with BEDROCK_SEM:
+            async for event in super().stream(*args, **kwargs):
+                yield event
+
+
+formatter_system_prompt = cached_system_prompt(FORMATTER_MODEL_ID, RESEARCH_FORMATTER_PROMPT)
+
+
+# Shared Bedrock models by name: "agent" backs both search agents, "formatter" backs
+# format_research_response. Each is built on first use, not at import.
+BEDROCK_MODEL_CONFIGS = {
+    "agent": {},
+    "formatter": {"model_id": FORMATTER_MODEL_ID, "region_name": "us-east-1"},
+}
+bedrock_models = {}
+bedrock_models_lock = asyncio.Lock()
 
-@app.get('/')
-def health_check():
+
+async def get_bedrock_model(name: str) -> BoundedBedrockModel:
+    """
+    Return the shared Bedrock model for name, creating it on first use.
+
+    Creating a BedrockModel builds a boto3 client synchronously, so that runs in a thread
+    to keep the event loop free; the lock makes concurrent first requests build it once.
+
+    Args:
+        name (str): A key of BEDROCK_MODEL_CONFIGS
+
+    Returns:
+        BoundedBedrockModel: The shared model
+    """
+    model = bedrock_models.get(name)
+    if model is None:
+        async with bedrock_models_lock:
+            model = bedrock_models.get(name)
+            if model is None:
+                model = await asyncio.to_thread(BoundedBedrockModel, **BEDROCK_MODEL_CONFIGS[name])
+                bedrock_models[name] = model
+    return model
+
+
+async def new_deep_research_web_agent():
+    """
+    Create a deep research agent for a single request.
+
+    Agents keep conversation history and reject concurrent invocations, so each request
+    gets its own agent on top of the shared model.
+    """
+    return Agent(
+        model=await get_bedrock_model("agent"),
+        system_prompt=SYSTEM_PROMPT,
+        tools=[
+            web_search,
+            web_crawl,
+            web_extract,
+            format_research_response,
+        ],
+    )
+
+
+async def new_simple_web_agent():
+    """Create a simple search agent for a single request, see new_deep_research_web_agent."""
+    return Agent(
+        model=await get_bedrock_model("agent"),
+        system_prompt=SIMPLE_SEARCH_PROMPT,
+        tools=[
+            web_search,
+            web_answer
+        ],
+    )
+
+@app.get('/', response_class=ORJSONResponse)
+async def root():
     """
     Default endpoint.
     
     Returns:
-        dict: A status message
+        ORJSONResponse: A status message
     """
-    return {"status": "healthy"}
+    return ORJSONResponse({"status": "healthy"})
 
-@app.get('/health')
-def health_check():
+@app.get('/health', response_class=ORJSONResponse)
+async def health_check():
     """
     Health check endpoint for the load balancer.
     
     Returns:
-        dict: A status message indicating the service is ?promy
+        ORJSONResponse: A status message indicating the service is healthy
     """
-    return {"status": "healthy"}
-
-@app.get('/simple-search')
-async def search(prompt: str):
+    return ORJSONResponse({"status": "healthy"})
+
+# Add CORS headers to ensure streaming works across domains
+DEEP_SEARCH_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Disable nginx buffering
+}
+
+
+async def run_search(
+    agent,
+    prompt: str,
+    headers: Optional[dict] = None,
+    cache_namespace: Optional[str] = None,
+):
     """
-    Search endpoint that accepts a prompt parameter, does a websearch based on the prompt and returns a streaming response
+    Shared implementation of the search endpoints.
 
     Args:
+        agent: The agent instance to use
         prompt (str): The prompt parameter from the query string
-        promptId (str, optional): Optional promptId parameter
-        sessionId (str, optional): Optional sessionId parameter
+        headers (Optional[dict]): Extra headers for the streaming response
+        cache_namespace (Optional[str]): If set, completed responses are stored in and
+            served from the response cache under this namespace
 
-     Returns:
+    Returns:
         StreamingResponse: A streaming response of the web search results
 
     Raises:
         HTTPException: If the request is invalid or if an error occurs
     """
     try:
-        print(f"Searching the web for {prompt}")
+        logger.info("Searching the web for %s", prompt)
         if not prompt:
             raise HTTPException(status_code=400, detail="No prompt provided")
 
+        on_complete = None
+        if cache_namespace:
+            cached_response = await asyncio.to_thread(
+                response_cache.get, cache_namespace, prompt
+            )
+            if cached_response is not None:
+                return StreamingResponse(
+                    iter([cached_response]), media_type="text/plain", headers=headers
+                )
+
+            async def on_complete(text: str):
+                await asyncio.to_thread(response_cache.set, cache_namespace, prompt, text)
+
         return StreamingResponse(
-            stream_web_search_response(simple_web_agent, prompt),
-            media_type="text/plain"
+            stream_web_search_response(agent, prompt, on_complete=on_complete),
+            media_type="text/plain",
+            headers=headers
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get('/deep-search')
-async def search(prompt: str):
+@app.get('/simple-search')
+async def simple_search(prompt: str):
     """
     Search endpoint that accepts a prompt parameter, does a websearch based on the prompt and returns a streaming response
-    
+
     Args:
         prompt (str): The prompt parameter from the query string
-     Returns:
+
+    Returns:
         StreamingResponse: A streaming response of the web search results
-        
-    Raises:
-        HTTPException: If the request is invalid or if an error occurs
     """
-    try:
-        print(f"Searching the web for {prompt}")
-        if not prompt:
-            raise HTTPException(status_code=400, detail="No prompt provided")
+    return await run_search(await new_simple_web_agent(), prompt, cache_namespace="simple-search")
 
-        # Add CORS headers to ensure streaming works across domains
-        headers = {
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type",
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",  # Disable nginx buffering
-        }
-        
-        return StreamingResponse(
-            stream_web_search_response(deep_research_web_agent, prompt),
-            media_type="text/plain",
-            headers=headers
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
+
+@app.get('/deep-search')
+async def deep_search(prompt: str):
+    """
+    Search endpoint that accepts a prompt parameter, does a deep research websearch based on the prompt and returns a streaming response
     
-async def stream_web_search_response(agent, prompt: str):
+    Args:
+        prompt (str): The prompt parameter from the query string
+
+    Returns:
+        StreamingResponse: A streaming response of the web search results
+    """
+    return await run_search(await new_deep_research_web_agent(), prompt, headers=DEEP_SEARCH_HEADERS)
+
+
+class ChunkBuffer:
+    """Coalesces small text fragments so the stream sends fewer, larger chunks."""
+
+    def __init__(self, max_bytes: int = STREAM_FLUSH_BYTES, max_age: float = STREAM_FLUSH_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.parts = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, text: str) -> str:
+        """Buffer a fragment, returning the buffered text once a threshold is reached or "" otherwise."""
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.max_bytes or time.monotonic() - self.last_flush >= self.max_age:
+            return self.flush()
+        return ""
+
+    def flush(self) -> str:
+        """Return and clear everything buffered so far."""
+        text = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+        return text
+
+
+async def stream_web_search_response(
+    agent, prompt: str, on_complete: Optional[Callable[[str], Awaitable[None]]] = None
+):
     """
     Run the web search assistant and stream the response.
     
     Args:
         agent: The agent instance to use
         prompt (str): The user's prompt
+        on_complete (Optional[Callable[[str], Awaitable[None]]]): Awaited with the full streamed
+            text once the agent finishes without error and no tool call failed
 
     Yields:
         str: Chunks of the response as they become available
     """
+    streamed = []
+    try:
+        async for chunk in stream_agent_chunks(agent, prompt):
+            if on_complete:
+                streamed.append(chunk)
+            yield chunk
+    except Exception as e:
+        yield f"\nError during streaming: {str(e)}"
+        return
+
+    if on_complete and not had_tool_error(agent):
+        await on_complete("".join(streamed))
+
+
+def had_tool_error(agent) -> bool:
+    """
+    Check whether any tool call in the agent's conversation returned an error.
+
+    Args:
+        agent: The agent instance that handled the request
+
+    Returns:
+        bool: True if a tool result has status "error"
+    """
+    return any(
+        content.get("toolResult", {}).get("status") == "error"
+        for message in agent.messages
+        for content in message.get("content", [])
+    )
+
+
+async def stream_agent_chunks(agent, prompt: str):
+    """
+    Convert the agent's event stream into text chunks, raising on agent errors.
+
+    Args:
+        agent: The agent instance to use
+        prompt (str): The user's prompt
+
+    Yields:
+        str: Chunks of the response as they become available
+    """
+    # Text is buffered; anything else flushes the buffer first to keep ordering
+    buffer = ChunkBuffer()
+
     try:
         # Debug message to confirm streaming has started
         yield "Starting search...\n"
@@ -369,41 +837,76 @@ async def stream_web_search_response(agent, prompt: str):
         # Stream the response
         async for item in agent.stream_async(prompt):
             # Debug the structure of each item
-            item_type = str(type(item))
-            yield f"\n[DEBUG: Received item of type {item_type}]\n"
+            if DEBUG_STREAM:
+                yield buffer.flush() + f"\n[DEBUG: Received item of type {type(item).__name__}]\n"
             
             if "message" in item and "content" in item["message"] and "role" in item["message"] and item["message"]["role"] == "assistant":
-                yield f"\n[DEBUG: Found assistant message with content]\n"
+                if DEBUG_STREAM:
+                    yield buffer.flush() + f"\n[DEBUG: Found assistant message with content]\n"
                 
                 for content_item in item['message']['content']:
                     # Debug the content item structure
-                    content_keys = str(content_item.keys())
-                    yield f"\n[DEBUG: Content item keys: {content_keys}]\n"
+                    if DEBUG_STREAM:
+                        yield buffer.flush() + f"\n[DEBUG: Content item keys: {list(content_item)}]\n"
                     
                     if "text" in content_item:
-                        # Stream the actual text content
-                        yield f"\n[DEBUG: Found text content: {content_item['text'][:30]}...]\n"
-                        yield content_item["text"]
+                        # The text was already streamed token by token through "data" items
+                        if DEBUG_STREAM:
+                            yield buffer.flush() + f"\n[DEBUG: Found text content: {content_item['text'][:30]}...]\n"
                     elif "toolUse" in content_item and "name" in content_item["toolUse"]:
-                        yield f"\n[Using tool: {content_item['toolUse']['name']}]\n"
-                        yield f"    \n[{content_item}]\n"
+                        yield (
+                            buffer.flush()
+                            + f"\n[Using tool: {content_item['toolUse']['name']}]\n"
+                            + f"    \n[{content_item}]\n"
+                        )
             elif "data" in item:
-                yield f"\n[DEBUG: Found data item]\n"
-                yield item['data']
+                if DEBUG_STREAM:
+                    yield buffer.flush() + f"\n[DEBUG: Found data item]\n"
+                chunk = buffer.add(item['data'])
+                if chunk:
+                    yield chunk
+            elif "tool_stream_event" in item and isinstance(
+                item["tool_stream_event"].get("data"), dict
+            ) and "delta" in item["tool_stream_event"]["data"]:
+                # Forward tokens streamed by tools such as format_research_response
+                chunk = buffer.add(item["tool_stream_event"]["data"]["delta"])
+                if chunk:
+                    yield chunk
+            elif "contentBlockDelta" in item.get("event", {}):
+                # Raw model token events duplicate the text already sent via "data" items
+                continue
             else:
-                yield f"\n[DEBUG: Unhandled item: {str(item)[:100]}...]\n"
-    except Exception as e:
-        yield f"\nError during streaming: {str(e)}"
+                # Any other event (tool result, message boundary, ...) is a transition,
+                # so send buffered text now rather than waiting for the next token
+                chunk = buffer.flush()
+                if DEBUG_STREAM:
+                    chunk += f"\n[DEBUG: Unhandled item: {repr(item)[:100]}...]\n"
+                if chunk:
+                    yield chunk
+    except Exception:
+        # Send whatever was buffered before the error is reported
+        remaining = buffer.flush()
+        if remaining:
+            yield remaining
+        raise
+
+    remaining = buffer.flush()
+    if remaining:
+        yield remaining
 
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 8000))
-    print(f"Starting Agent Websearch on port {port}")
+    logger.info("Starting Agent Websearch on port %s", port)
     uvicorn.run(
-        app, 
+        "web-search:app",  # Import string is required to run multiple workers
         host='0.0.0.0', 
         port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "2")),
         log_level="info",  # Enable debug logging
-        timeout_keep_alive=0,  # Disable keep-alive timeout
+        # Must exceed the load balancer idle timeout (60s) so it never reuses a closed connection
+        timeout_keep_alive=int(os.getenv("TIMEOUT_KEEP_ALIVE", "65")),
         timeout_graceful_shutdown=1,  # Quick shutdown
-        limit_concurrency=10,  # Limit concurrent connections
+        limit_concurrency=256,  # Limit concurrent connections
     )